@@ -5,21 +5,47 @@ import os
 import subprocess
 from pathlib import Path
 import sys
-import json
 import signal
-import threading
-
-signal.signal(signal.SIGINT, lambda sig, frame : sys.exit(1))
+import hashlib
+import tempfile
+import shlex
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import orjson as json
+except ImportError:
+    import json
 
 # Specify how many microseconds are analyzed to probe the input. 
 # A higher value will enable detecting more accurate information, but will increase latency. 
 # It defaults to 5,000,000 microseconds = 5 seconds.
-FFMPEG_ANALYZEDURATION=str(100_000_000)
+FFMPEG_ANALYZEDURATION=str(5_000_000)
 
 # Set probing size in bytes, i.e. the size of the data to analyze to get stream information. 
 # A higher value will enable detecting more information in case it is dispersed into the stream, but will increase latency. 
 # Must be an integer not lesser than 32. It is 5000000 by default.
-FFMPEG_PROBESIZE=str(100_000_000)
+FFMPEG_PROBESIZE=str(5_000_000)
+
+DEEP_PROBE_EXTENSIONS = {'.ts', '.m2ts', '.mts'}
+FFMPEG_DEEP_ANALYZEDURATION=str(100_000_000)
+FFMPEG_DEEP_PROBESIZE=str(100_000_000)
+
+IMAGE_CODECS = frozenset({'mjpeg', 'png'})
+IMAGE_SUBTITLE_CODECS = frozenset({'dvd_subtitle', 'dvb_subtitle', 'pgs_subtitle', 'hdmv_pgs_subtitle'})
+KNOWN_STREAM_TYPES = frozenset({'video', 'audio', 'subtitle'})
+
+BYTE_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
+
+FFMPEG_COMMAND = ('ffmpeg', '-nostdin', '-hide_banner')
+
+PROBE_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'mediautil')
+
+INTERRUPTED = False
+
+class FileProcessingError(Exception):
+    pass
 
 def is_valid_file(parser, arg) -> str:
     if os.path.isfile(arg):
@@ -32,7 +58,9 @@ def print_error(*args, **kwargs) -> None:
 
 def fatal(*args, **kwargs) -> None:
     print_error(*args, **kwargs)
-    exit(1)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(1)
 
 def verbose(*args, **kwargs) -> None:
     if ARGS.verbose:
@@ -43,24 +71,23 @@ def confirm() -> None:
     if ARGS.confirm:
         input('Press ENTER to continue or CTRL-C to abort\n')
 
+def probe_params(path: str) -> tuple[str, str]:
+    if os.path.splitext(path)[1].lower() in DEEP_PROBE_EXTENSIONS:
+        return FFMPEG_DEEP_ANALYZEDURATION, FFMPEG_DEEP_PROBESIZE
+    return FFMPEG_ANALYZEDURATION, FFMPEG_PROBESIZE
+
 def format_bytes(size: int, decimal_places=2) -> str:
-    for unit in ['B', 'KiB', 'MiB', 'GiB', 'TiB']:
-        if size < 1024.0 or unit == 'TiB':
-            break
-        size /= 1024.0
-    return f"{size:.{decimal_places}f} {unit}"
+    unit_index = min(max(size.bit_length() - 1, 0) // 10, len(BYTE_UNITS) - 1)
+    return f"{size / (1 << (unit_index * 10)):.{decimal_places}f} {BYTE_UNITS[unit_index]}"
 
 class FfmpegExecutor:
     args: list[str]
 
     def __init__(self, input_file_path: str) -> None:
-        self.args = ['ffmpeg']
+        analyzeduration, probesize = probe_params(input_file_path)
+        self.args = [*FFMPEG_COMMAND, '-analyzeduration', analyzeduration, '-probesize', probesize, '-i', input_file_path]
         if not ARGS.verbose:
-            self.args.extend(['-loglevel', 'warning'])
-        self.args.extend(['-nostdin', '-hide_banner'])
-        self.args.extend(['-analyzeduration', FFMPEG_ANALYZEDURATION])
-        self.args.extend(['-probesize', FFMPEG_PROBESIZE])
-        self.args.extend(['-i', input_file_path])
+            self.args[1:1] = ['-loglevel', 'warning']
     
     def add_arg(self, argument: str) -> None:
         self.args.append(argument)
@@ -73,46 +100,53 @@ class FfmpegExecutor:
         if ARGS.dry_run:
             print("(dry-run, not actually executing)")
             return 0
-        process = subprocess.Popen(self.args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        output_reader = threading.Thread(target=self.__read_output, args=(process,))
-        output_reader.start()
-        process.wait()
-        output_reader.join()
-        return process.returncode
-
-    def __read_output(self, process):
-        for line in iter(process.stdout.readline, b''):
-            sys.stdout.write(line.decode(sys.stdout.encoding))
-        process.stdout.close()
+        sys.stdout.flush()
+        process = subprocess.Popen(self.args, stdin=subprocess.DEVNULL, stdout=sys.stdout.fileno(), stderr=subprocess.STDOUT)
+        return process.wait()
 
     def __str__(self) -> str:
-        return ' '.join(self.args)
+        return shlex.join(self.args)
 
 class Stream:
+    __slots__ = ('type', 'codec_name', 'index', 'raw', 'tags', 'language', 'title', 'filename', 'mimetype',
+                 '_is_video', '_is_audio', '_is_subtitle', '_is_default', '_is_forced', '_is_hearing_impaired',
+                 '_is_image_based_subtitle', '_size_in_bytes')
     type: str
     codec_name: str
     index: int
     raw: dict
-    tags: dict = dict()
-    language: str = "unknown"
-    title: str = ""
-    filename: str = ""
-    mimetype: str = ""
+    tags: dict
+    language: str
+    title: str
+    filename: str
+    mimetype: str
 
     def __init__(self, raw: dict):
         self.type = raw.get("codec_type")
         self.codec_name = raw.get("codec_name")
         self.index = int(raw.get("index"))
         self.raw = raw
+        self.tags = {}
+        self.language = "unknown"
+        self.title = ""
+        self.filename = ""
+        self.mimetype = ""
         if 'tags' in raw:
             self.__parse_tags(raw['tags'])
 
-    def __has_disposition(self, disposition: str) -> bool:
-        if 'disposition' not in self.raw or disposition not in self.raw['disposition']:
-            return False
-        value = int(self.raw['disposition'][disposition])
-        return value > 0
-    
+        title_upper = self.title.upper()
+        forced_in_title = "FORCED" in title_upper
+        sdh_in_title = "SDH" in title_upper
+        self._is_video = self.type == 'video'
+        self._is_audio = self.type == 'audio'
+        self._is_subtitle = self.type == 'subtitle'
+        disposition = raw.get('disposition') or {}
+        self._is_default = int(disposition.get('default', 0)) > 0
+        self._is_forced = int(disposition.get('forced', 0)) > 0 or forced_in_title
+        self._is_hearing_impaired = int(disposition.get('hearing_impaired', 0)) > 0 or sdh_in_title
+        self._is_image_based_subtitle = self._is_subtitle and self.codec_name in IMAGE_SUBTITLE_CODECS
+        self._size_in_bytes = self.__parse_size_in_bytes()
+
     def __parse_tags(self, tags: dict) -> None:
         self.tags = tags
         if tags.get('language'):
@@ -124,141 +158,180 @@ class Stream:
         if tags.get('mimetype'):
             self.mimetype = tags.get('mimetype')
     
-    def get_size_in_bytes(self) -> int:
-        if 'tags' not in self.raw:
-            return None
-        tags = self.raw['tags']
-        numbytes_tags = [tag for tag in tags if tag.startswith('NUMBER_OF_BYTES')]
-        if len(numbytes_tags) > 0:
-            return int(tags.get(numbytes_tags[0]))
-        else:
+    def __parse_size_in_bytes(self) -> int:
+        tags = self.tags
+        # Usually NUMBER_OF_BYTES or NUMBER_OF_BYTES-eng, scanning all tags is the fallback
+        numbytes = tags.get('NUMBER_OF_BYTES-eng') or tags.get('NUMBER_OF_BYTES') \
+            or next((value for tag, value in tags.items() if tag.startswith('NUMBER_OF_BYTES')), None)
+        if numbytes is None:
             return None
+        return int(numbytes)
+
+    def get_size_in_bytes(self) -> int:
+        return self._size_in_bytes
     
     def is_video(self) -> bool:
-        return self.type == 'video'
+        return self._is_video
     def is_audio(self) -> bool:
-        return self.type == 'audio'
+        return self._is_audio
     def is_subtitle(self) -> bool:
-        return self.type == 'subtitle'
+        return self._is_subtitle
     def is_unknown_type(self) -> bool:
-        return self.type not in ['video', 'audio', 'subtitle']
+        return self.type not in KNOWN_STREAM_TYPES
     
     def is_image(self) -> bool:
-        return self.codec_name in ['mjpeg', 'png']
+        return self.codec_name in IMAGE_CODECS
     
     def is_default(self) -> bool:
-        return self.__has_disposition('default')
+        return self._is_default
     def is_forced(self) -> bool:
-        return self.__has_disposition('forced') or "FORCED" in self.title.upper()
+        return self._is_forced
     def is_hearing_impaired(self) -> bool:
-        return self.__has_disposition('hearing_impaired') or "SDH" in self.title.upper()
+        return self._is_hearing_impaired
     def is_image_based_subtitle(self) -> bool:
-        return self.is_subtitle() and self.raw.get('codec_name') in ['dvd_subtitle', 'dvb_subtitle', 'pgs_subtitle', 'hdmv_pgs_subtitle']
+        return self._is_image_based_subtitle
 
     def __str__(self) -> str:
-        result = list()
-        result.append("Stream #" + str(self.index))
-        result.append(self.type)
-        if self.language and (self.is_audio() or self.is_subtitle()):
-            result.append("(" + self.language + ")")
+        raw = self.raw
+        result = [f"Stream #{self.index}", self.type]
+        if self.language and (self._is_audio or self._is_subtitle):
+            result.append(f"({self.language})")
         
         if self.codec_name:
-                result.append(self.codec_name)
+            result.append(self.codec_name)
         
-        if self.raw.get('profile'):
-            result.append("(" + self.raw.get('profile') + ")")
+        if raw.get('profile'):
+            result.append(f"({raw['profile']})")
 
-        if 'width' in self.raw:
-            result.append(str(self.raw.get('width')) + "x" + str(self.raw.get('height')))
+        if 'width' in raw:
+            result.append(f"{raw['width']}x{raw.get('height')}")
         
-        if self.raw.get('channel_layout'):
-            result.append(self.raw.get('channel_layout'))
+        if raw.get('channel_layout'):
+            result.append(raw['channel_layout'])
 
-        num_bytes = self.get_size_in_bytes()
-        if num_bytes:
-            result.append(format_bytes(num_bytes))
+        if self._size_in_bytes:
+            result.append(format_bytes(self._size_in_bytes))
         
         if self.title:
-            result.append("'" + self.title + "'")
+            result.append(f"'{self.title}'")
         
         if self.filename:
-            result.append("'" + self.filename + "'")
+            result.append(f"'{self.filename}'")
         if self.mimetype:
-            result.append("(" + self.mimetype + ")")
+            result.append(f"({self.mimetype})")
 
-        if self.is_default():
+        if self._is_default:
             result.append("(default)")
-        if self.is_forced():
+        if self._is_forced:
             result.append("(forced)")
-        if self.is_hearing_impaired():
+        if self._is_hearing_impaired:
             result.append("(hi)")
 
         return ' '.join(result)
 
 
 class MediaFile:
+    __slots__ = ('path', 'container', 'streams', 'streams_by_type')
     path: str
     container: str
-    format: dict
     streams: list[Stream]
+    streams_by_type: dict[str, list[Stream]]
 
-    def __init__(self, path: str, format, streams: list[Stream]):
+    def __init__(self, path: str, streams: list[Stream]):
         self.path = path
-        self.format = format
         self.container = os.path.splitext(path)[1][1:]
         self.streams = streams
+
+        self.streams_by_type = {'video': [], 'audio': [], 'subtitle': [], 'other': []}
+        for stream in streams:
+            if stream.is_unknown_type():
+                self.streams_by_type['other'].append(stream)
+            else:
+                self.streams_by_type[stream.type].append(stream)
     
-    def get_video_streams(self) -> Stream:
-        return [stream for stream in self.streams if stream.is_video()]
-    def get_audio_streams(self) -> Stream:
-        return [stream for stream in self.streams if stream.is_audio()]
-    def get_subtitle_streams(self) -> Stream:
-        return [stream for stream in self.streams if stream.is_subtitle()]
-    def get_other_streams(self) -> Stream:
-        return [stream for stream in self.streams if stream.is_unknown_type()]
+    def get_video_streams(self) -> list[Stream]:
+        return self.streams_by_type['video']
+    def get_audio_streams(self) -> list[Stream]:
+        return self.streams_by_type['audio']
+    def get_subtitle_streams(self) -> list[Stream]:
+        return self.streams_by_type['subtitle']
+    def get_other_streams(self) -> list[Stream]:
+        return self.streams_by_type['other']
 
     def __str__(self) -> str:
-        video_streams = self.get_video_streams()
-        audio_streams = self.get_audio_streams()
-        subtitle_streams = self.get_subtitle_streams()
-        other_streams = self.get_other_streams()
-        result = list()
-        if video_streams: 
-            result.append("Video streams: \n" + '\n'.join(['   ' + str(s) for s in video_streams]))
-        if audio_streams: 
-            result.append("Audio streams: \n" + '\n'.join(['   ' + str(s) for s in audio_streams]))
-        if subtitle_streams: 
-            result.append("Subtitle streams: \n" + '\n'.join(['   ' + str(s) for s in subtitle_streams]))
-        if other_streams: 
-            result.append("Other streams: \n" + '\n'.join(['   ' + str(s) for s in other_streams]))
-        
+        streams_by_type = self.streams_by_type
+        sections = (("Video", streams_by_type['video']), ("Audio", streams_by_type['audio']),
+                    ("Subtitle", streams_by_type['subtitle']), ("Other", streams_by_type['other']))
+        result = [f"{name} streams: \n" + '\n'.join(f"   {stream}" for stream in streams)
+                  for name, streams in sections if streams]
         return '\n'.join(result)
 
-def parse_mediafile(filepath: str) -> MediaFile:
+def probe_file(filepath: str) -> subprocess.CompletedProcess:
     cmd = ['ffprobe', '-hide_banner']
-    cmd.extend(['-analyzeduration', FFMPEG_ANALYZEDURATION, '-probesize', FFMPEG_PROBESIZE])
+    analyzeduration, probesize = probe_params(filepath)
+    cmd.extend(['-analyzeduration', analyzeduration, '-probesize', probesize])
     cmd.extend(['-of', 'json'])
-    cmd.extend(['-show_streams', '-show_format'])
+    # All stream tags are kept, NUMBER_OF_BYTES may carry any language suffix
+    cmd.extend(['-show_entries', 'stream=index,codec_type,codec_name,profile,width,height,channel_layout'
+                                 ':stream_tags:stream_disposition'])
     cmd.extend([filepath])
+
+    if not ARGS.probe_cache:
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    cache_file = get_probe_cache_file(filepath, cmd)
+    try:
+        with open(cache_file, 'rb') as f:
+            return subprocess.CompletedProcess(cmd, 0, f.read(), b'')
+    except FileNotFoundError:
+        pass
+
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode == 0 and not ARGS.dry_run:
+        write_probe_cache(cache_file, result.stdout)
+    return result
+
+def get_probe_cache_file(filepath: str, cmd: list[str]) -> str:
+    st = os.stat(filepath)
+    key = f"{os.path.abspath(filepath)}|{st.st_mtime_ns}|{st.st_size}|{' '.join(cmd[:-1])}"
+    return os.path.join(PROBE_CACHE_DIR, hashlib.blake2b(key.encode(), digest_size=20).hexdigest() + '.json')
+
+def write_probe_cache(cache_file: str, data: bytes) -> None:
+    try:
+        os.makedirs(PROBE_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=PROBE_CACHE_DIR, delete=False) as f:
+            f.write(data)
+        os.replace(f.name, cache_file)
+    except OSError:
+        pass
+
+def probe_files(filepaths: list[str]) -> dict[str, subprocess.CompletedProcess]:
+    with ThreadPoolExecutor(max_workers=min(len(filepaths), (os.cpu_count() or 1) * 2)) as pool:
+        return dict(zip(filepaths, pool.map(probe_file, filepaths)))
+
+def parse_mediafile(filepath: str, result: subprocess.CompletedProcess = None) -> MediaFile:
+    if result is None:
+        result = probe_file(filepath)
 
     if result.returncode != 0:
         print_error(result.stderr.decode(sys.stdout.encoding))
         fatal("Failed to parse file info from %s" % filepath)
 
-    ffprobe_output = result.stdout.decode(sys.stdout.encoding)
     if ARGS.verbose:
-        print(ffprobe_output)
-    data=json.loads(ffprobe_output)
-    format = data['format']
+        sys.stdout.flush()
+        sys.stdout.buffer.write(result.stdout)
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+    data=json.loads(result.stdout)
     streams = [Stream(stream_data) for stream_data in data['streams']]
 
     # Validate indexes
-    for i in range(len(streams)):
-        if i != streams[i].index:
-            fatal("The array index " + str(i) + " does not match the stream index " + str(streams[i].index))
+    if __debug__:
+        for i, stream in enumerate(streams):
+            if i != stream.index:
+                fatal("The array index " + str(i) + " does not match the stream index " + str(stream.index))
 
-    return MediaFile(filepath, format, streams)
+    return MediaFile(filepath, streams)
 
 def parse_args() -> argparse.Namespace:
     argparser = argparse.ArgumentParser(prog='Mediautil', description='Multi-purpose media editing tool')
@@ -276,18 +349,20 @@ def parse_args() -> argparse.Namespace:
     argparser.add_argument('--extract-subs', dest='extract_subs', help='Extract all subtitle streams', action='store_true')
     argparser.add_argument('-eds', '--extract-and-delete-subs', dest='extract_and_delete_subs', help='Extract and delete all subtitle streams', action='store_true')
 
+    argparser.add_argument('-j', '--jobs', type=int, default=1, metavar='N', help='Process up to N files in parallel, implies --no-confirm')
     argparser.add_argument('-d', '--create-dir', action='store_true', help='Store the output in a directory with the same name as the input file')
     argparser.add_argument('-v', '--verbose', action='store_true', help='Verbose mode')
     argparser.add_argument('--dry-run', '--nono', action='store_true', help='Make no changes')
     argparser.add_argument('--no-confirm', dest='confirm', action='store_false', help='Disables confirmation dialog before executing')
     argparser.add_argument('--no-cleanup', dest='cleanup', action='store_false', help='Disables cleanup of old file')
+    argparser.add_argument('--no-probe-cache', dest='probe_cache', action='store_false', help='Always run ffprobe instead of reusing cached output. The cache in ~/.cache/mediautil is never pruned')
 
     args = argparser.parse_args()
     if args.extract_and_delete_subs:
         args.extract_subs = True
         args.delete_subs = True
     
-    if args.dry_run:
+    if args.dry_run or args.jobs > 1:
         args.confirm = False
 
     if args.delete_stream:
@@ -298,53 +373,79 @@ def parse_args() -> argparse.Namespace:
     
     return args
 
-def extract_subtitles(input_file: MediaFile, destination_dir: str):
+def get_subtitle_outputs(input_file: MediaFile, destination_dir: str) -> list[tuple[Stream, list[str]]]:
     subtitle_streams = input_file.get_subtitle_streams()
     if not subtitle_streams:
         print("WARNING: No subtitle streams present")
-        return
+        return []
     subtitle_streams = [stream for stream in subtitle_streams if not stream.is_image_based_subtitle()]
     if not subtitle_streams:
         print("WARNING: Only image based subtitle streams present, will not extract any subtitles")
-        return
+        return []
 
     inputfilename_without_extension = Path(input_file.path).stem
 
+    try:
+        existing_files = set(os.listdir(destination_dir))
+    except FileNotFoundError:
+        # Only happens in dry-run mode, where the working dir is not created
+        existing_files = set()
+
+    outputs = []
     for subtitle in subtitle_streams:
-        output_file = resolve_new_subtitle_file_path(subtitle, inputfilename_without_extension, destination_dir)
+        output_file = resolve_new_subtitle_file_path(subtitle, inputfilename_without_extension, destination_dir, existing_files)
 
         print("Extracting subtitle: " + str(subtitle))
-        executor = FfmpegExecutor(input_file.path)
-        executor.add_args(['-map', '0:' + str(subtitle.index)])
-        executor.add_args(['-c', 'srt'])
-        executor.add_arg(output_file)
-        exitcode = executor.execute()
-        if exitcode != 0:
+        outputs.append((subtitle, ['-map', '0:' + str(subtitle.index), '-c', 'srt', output_file]))
+    return outputs
+
+def extract_subtitles_separately(input_file_path: str, subtitle_outputs: list[tuple[Stream, list[str]]]) -> None:
+    for subtitle, subtitle_args in subtitle_outputs:
+        executor = FfmpegExecutor(input_file_path)
+        executor.add_args(subtitle_args)
+        if executor.execute() != 0:
             print_error("Failed to extract subtitle: " + str(subtitle))
+            remove_if_exists(subtitle_args[-1])
 
-def resolve_new_subtitle_file_path(subtitle: Stream, name: str, destination_dir: str) -> str:
+def remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+
+# The chosen file name is added to existing_files
+def resolve_new_subtitle_file_path(subtitle: Stream, name: str, destination_dir: str, existing_files: set[str]) -> str:
     language_str = subtitle.language
     if subtitle.is_hearing_impaired():
         language_str += ".sdh"
     if subtitle.is_forced():
         language_str += ".forced"
 
-    output_base = destination_dir + "/" + name + "." + language_str
-    output_file = output_base + ".srt"
+    output_base = name + "." + language_str
+    output_name = output_base + ".srt"
     i = 0
-    while os.path.exists(output_file):
+    while output_name in existing_files:
         i += 1
-        output_file = output_base + "." + str(i) + ".srt"
-    return output_file
+        output_name = output_base + "." + str(i) + ".srt"
+    existing_files.add(output_name)
+    return destination_dir + "/" + output_name
+
+def needs_stream_info() -> bool:
+    if (ARGS.list or ARGS.extract_subs or ARGS.delete_subs or ARGS.set_stream_language
+            or ARGS.delete_stream or ARGS.delete_audio_streams_except != None or ARGS.delete_image_streams):
+        return True
+    return not (ARGS.output_container or ARGS.delete_data_streams)
 
-def process_file(input_file_path: str) -> None:
+def process_file(input_file_path: str, probe_result: subprocess.CompletedProcess = None) -> None:
 
     print("\nProcessing '" + input_file_path + "'")
-    input_file = parse_mediafile(input_file_path)
+    if not needs_stream_info():
+        verbose("No stream info needed for the selected actions, skipping ffprobe")
+        input_file = MediaFile(input_file_path, list())
+    else:
+        input_file = parse_mediafile(input_file_path, probe_result)
 
-    print("\n" + str(input_file) + "\n")
-    if ARGS.list:
-        return
+        print("\n" + str(input_file) + "\n")
+        if ARGS.list:
+            return
 
     if ARGS.output_container:
         output_container = ARGS.output_container
@@ -356,9 +457,7 @@ def process_file(input_file_path: str) -> None:
     num_actions = 0
     action_list = list()
 
-    executor = FfmpegExecutor(input_file.path)
-    executor.add_args(['-c', 'copy'])
-    executor.add_args(['-map', '0'])
+    output_args = ['-c', 'copy', '-map', '0']
 
     if container_change:
         num_actions += 1
@@ -383,7 +482,7 @@ def process_file(input_file_path: str) -> None:
         else:
             num_actions += 1
             action_list.append(" * Will update the following stream language to '" + new_language + "'" + "   " + str(stream_to_modify))        
-            executor.add_args(['-metadata:s:' + str(stream_index), 'language=' + new_language])
+            output_args += ['-metadata:s:' + str(stream_index), 'language=' + new_language]
 
     if ARGS.delete_stream != None:
         for index in ARGS.delete_stream:
@@ -391,7 +490,7 @@ def process_file(input_file_path: str) -> None:
                 fatal("Stream index not found: " + str(index))
             num_actions += 1
             stream_to_delete = input_file.streams[index]
-            executor.add_args(['-map', '-0:' + str(stream_to_delete.index)])
+            output_args += ['-map', '-0:' + str(stream_to_delete.index)]
             action_list.append(" * Will delete the following stream:" + "   " + str(stream_to_delete))
         
     if ARGS.delete_audio_streams_except != None:
@@ -404,7 +503,7 @@ def process_file(input_file_path: str) -> None:
             action_list.append(" * Will delete the following audio streams:")
             for stream in audio_streams_to_delete:
                 action_list.append("    - " + str(stream))
-                executor.add_args(['-map', '-0:' + str(stream.index)])
+                output_args += ['-map', '-0:' + str(stream.index)]
 
     if ARGS.delete_image_streams:
         image_streams_to_delete = [stream for stream in input_file.get_video_streams() if stream.is_image()]
@@ -413,19 +512,18 @@ def process_file(input_file_path: str) -> None:
             action_list.append(" * Will delete the following image video streams:")
             for stream in image_streams_to_delete:
                 action_list.append("    - " + str(stream))
-                executor.add_args(['-map', '-0:' + str(stream.index)])
+                output_args += ['-map', '-0:' + str(stream.index)]
 
     if ARGS.delete_data_streams:
         num_actions += 1
         action_list.append(" * Will delete data streams")
-        executor.add_args(['-dn'])
-        executor.add_args(['-map_chapters', '-1'])
+        output_args += ['-dn', '-map_chapters', '-1']
 
     if ARGS.delete_subs:
         if len(input_file.get_subtitle_streams()) > 0:
             num_actions += 1
             action_list.append(" * Will delete all subtitle streams")
-            executor.add_arg('-sn')
+            output_args.append('-sn')
         else:
             action_list.append(" * Requested deletion of all subtitle streams but none exists")
 
@@ -447,39 +545,70 @@ def process_file(input_file_path: str) -> None:
 
     confirm()
 
-    inputfilename_without_extension = Path(input_file.path).stem
-    
-    working_dir = os.path.dirname(os.path.abspath(input_file.path))
+    # absolute() rather than resolve(), the output should end up next to a symlink and not next to its target
+    input_path = Path(input_file.path).absolute()
+    inputfilename_without_extension = input_path.stem
+
+    working_dir = input_path.parent
     if ARGS.create_dir:
-        working_dir = working_dir + "/" + inputfilename_without_extension
+        working_dir = working_dir / inputfilename_without_extension
+    working_dir = str(working_dir)
 
-    working_file = working_dir + "/" + inputfilename_without_extension + ".new." + output_container
+    working_file = f"{working_dir}/{inputfilename_without_extension}.new.{output_container}"
     verbose("Working file    : " + working_file)
     if os.path.exists(working_file):
         fatal("Working file already exists: " + working_file)
 
-    output_file = working_dir + "/" + inputfilename_without_extension + "." + output_container
+    output_file = f"{working_dir}/{inputfilename_without_extension}.{output_container}"
     verbose("Destination file: " + output_file)
 
     if container_change and os.path.exists(output_file):
         fatal("Output file already exists: " + output_file)
 
 
-    if not os.path.exists(working_dir) and not ARGS.dry_run:
+    if ARGS.create_dir and not ARGS.dry_run:
         verbose("Creating working dir: " + working_dir)
-        os.makedirs(working_dir)
+        os.makedirs(working_dir, exist_ok=True)
 
+    subtitle_outputs = list()
     if ARGS.extract_subs:
-        extract_subtitles(input_file, working_dir)
+        subtitle_outputs = get_subtitle_outputs(input_file, working_dir)
+    subtitle_args = [arg for _, args in subtitle_outputs for arg in args]
 
     if num_actions == 0:
         # the only action was to extract subs
+        if subtitle_outputs:
+            executor = FfmpegExecutor(input_file.path)
+            executor.add_args(subtitle_args)
+            if executor.execute() != 0 and not INTERRUPTED:
+                print_error("Failed to extract subtitles, retrying one subtitle at a time")
+                for _, args in subtitle_outputs:
+                    remove_if_exists(args[-1])
+                extract_subtitles_separately(input_file.path, subtitle_outputs)
         return
     
     print("Performing selected actions on source file")
+    executor = FfmpegExecutor(input_file.path)
+    executor.add_args(subtitle_args)
+    executor.add_args(output_args)
     executor.add_arg(working_file)
     returncode = executor.execute()
 
+    if returncode != 0 and subtitle_outputs and not INTERRUPTED:
+        print_error("ffmpeg execution failed with exit code " + str(returncode) + ", retrying with the subtitles extracted separately")
+        for _, args in subtitle_outputs:
+            remove_if_exists(args[-1])
+        remove_if_exists(working_file)
+        executor = FfmpegExecutor(input_file.path)
+        executor.add_args(output_args)
+        executor.add_arg(working_file)
+        returncode = executor.execute()
+        if returncode == 0:
+            extract_subtitles_separately(input_file.path, subtitle_outputs)
+
+    if INTERRUPTED:
+        remove_if_exists(working_file)
+        fatal("Interrupted, leaving " + input_file.path + " untouched")
     if returncode != 0:
         fatal("ffmpeg execution failed with exit code " + str(returncode))
 
@@ -498,23 +627,81 @@ def cleanup(inputfile: str, workingfile: str, outputfile: str) -> None:
         print("Modified file: " + workingfile)
         return
 
-    if not os.path.exists(workingfile):
+    verbose("Moving " + workingfile + " -> " + outputfile)
+    try:
+        os.replace(workingfile, outputfile)
+    except FileNotFoundError:
         fatal(workingfile + " does not exist. Aborting cleanup")
 
-    verbose("Deleting " + inputfile)
-    os.unlink(inputfile)
+    if os.path.abspath(inputfile) != os.path.abspath(outputfile):
+        verbose("Deleting " + inputfile)
+        os.unlink(inputfile)
 
-    verbose("Moving " + workingfile + " -> " + outputfile)
-    os.replace(workingfile, outputfile)
+def set_args(args: argparse.Namespace) -> None:
+    global ARGS, verbose
+    ARGS = args
+    if not args.verbose:
+        verbose = lambda *args, **kwargs: None
+
+def init_worker(args: argparse.Namespace) -> None:
+    global fatal
+    signal.signal(signal.SIGINT, interrupt_worker)
+    set_args(args)
+    fatal = fail_file
 
-ARGS = parse_args()
-verbose('Arguments:\n  ' + '\n  '.join(f'{k}={v}' for k, v in vars(ARGS).items() if v != None) + "\n")
+def interrupt_worker(sig, frame) -> None:
+    global INTERRUPTED
+    INTERRUPTED = True
 
-if len(ARGS.files) > 1:
-    print("Input files:")
-    print('  ' + '\n  '.join(ARGS.files))
+def fail_file(*args, **kwargs) -> None:
+    print_error(*args, **kwargs)
+    raise FileProcessingError()
+
+def process_file_job(input_file_path: str) -> bool:
+    if INTERRUPTED:
+        return False
+    try:
+        process_file(input_file_path)
+        return True
+    except FileProcessingError:
+        return False
+
+if __name__ == '__main__':
+    signal.signal(signal.SIGINT, lambda sig, frame : sys.exit(1))
+
+    set_args(parse_args())
+    verbose('Arguments:\n  ' + '\n  '.join(f'{k}={v}' for k, v in vars(ARGS).items() if v != None) + "\n")
 
-for file in ARGS.files:
-    process_file(file)
     if len(ARGS.files) > 1:
-        print("---")
+        print("Input files:")
+        print('  ' + '\n  '.join(ARGS.files))
+
+    if ARGS.jobs > 1 and len(ARGS.files) > 1:
+        with ProcessPoolExecutor(max_workers=ARGS.jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(ARGS,)) as pool:
+            try:
+                results = list(pool.map(process_file_job, ARGS.files))
+            except BrokenProcessPool:
+                results = None
+            except SystemExit:
+                # Also stop the files already queued to the workers
+                for worker in multiprocessing.active_children():
+                    os.kill(worker.pid, signal.SIGINT)
+                pool.shutdown(cancel_futures=True)
+                raise
+
+        if results is None:
+            print_error("A worker process exited unexpectedly, aborting")
+            sys.exit(1)
+        if not all(results):
+            print_error(str(results.count(False)) + " of " + str(len(results)) + " files failed")
+            sys.exit(1)
+    else:
+        probe_results = dict()
+        if len(ARGS.files) > 1 and needs_stream_info() and (ARGS.list or not ARGS.confirm):
+            probe_results = probe_files(ARGS.files)
+
+        for file in ARGS.files:
+            process_file(file, probe_results.get(file))
+            if len(ARGS.files) > 1:
+                print("---")